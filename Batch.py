@@ -0,0 +1,265 @@
+'''
+Headless batch runner for Petri net analysis jobs.
+Nets are loaded from PNML (.pnml) or snapshot (.pns) files, jobs run without any
+display and every result is written as one JSON object per line.
+A sweep is the product of the given jobs, nets, initial markings and bounds; its
+jobs are spread over a process pool, each with its own timeout and memory limit.
+
+Usage:
+    python Batch.py net.pnml --job reachability --init "[1.p1]" --init "[2.p1]" --bound 1 --bound 2
+    python Batch.py worker.pnml,buffer.pnml --job deadlock --processes 8 --timeout 60 --memory 2048 --symmetry
+Nets separated by commas are merged with merge_net.
+'''
+
+'''
+Available jobs:
+    reachability  size of the reachability graph and its deadlocks
+    ts            size of the state-transition system (TranSys)
+    simulate      random firing sequence of --steps steps
+    deadlock      whether a reachable marking enables no transition
+    reach         whether the --target marking is reachable
+    coverability  boundedness and place bounds from the minimal coverability set
+    unfolding     size of the complete finite prefix and deadlock check on it (safe nets)
+'''
+
+import argparse
+import itertools
+import json
+import signal
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+from random import Random
+from Petrinet import TranSys, CoverGraph, OMEGA
+from Persistence import read_pnml, load_snapshot
+from Symmetry import Symmetry
+from Unfolding import Unfolding
+
+try:
+    import resource
+except ImportError:
+    resource = None
+#===============================================================================
+
+class JobTimeout(Exception):
+    """Raised inside a worker when a job runs out of time"""
+    pass
+
+
+def load_net(spec, bound):
+    """Load a net from a file, or merge several comma-separated files
+        Transitions with the same name in two files are merged into one, those of a
+        single file are all kept
+        @param spec: a .pnml or .pns path, or several separated by commas
+        @param bound: the token bound of the loaded net
+    """
+    net = None
+    for path in spec.split(","):
+        if path.lower().endswith(".pns"):
+            with load_snapshot(path) as snap:
+                part = snap.to_net(bound)
+        else:
+            part = read_pnml(path, bound)
+        if net == None:
+            net = part
+            continue
+        expected = Counter(t.name for t in net.transitions)
+        for name, n in Counter(t.name for t in part.transitions).items():
+            if name not in expected:
+                expected[name] = n
+        net = net.merge_net(part)
+        net.init_marking = [p.tokens for p in net.places]
+        if Counter(t.name for t in net.transitions) != expected:
+            raise Exception("Merging " + spec + " lost transitions")
+    return net
+
+
+def deadlocks_of(states, graph_edges):
+    """Return the states of a reachability graph without outgoing edges"""
+    sources = set(tuple(u) for u, v, t in graph_edges)
+    return [u for u in states if tuple(u) not in sources]
+
+#===============================================================================
+
+def run_reachability(net, options):
+    """Size of the reachability graph and its deadlocks"""
+    states, graph_edges = net.reachability_graph_edges(options["symmetry"])
+    return {"states": len(states), "edges": len(graph_edges),
+            "deadlocks": deadlocks_of(states, graph_edges)}
+
+
+def run_ts(net, options):
+    """Size of the state-transition system"""
+    ts = TranSys(net)
+    return {"states": len(ts.statespace), "edges": len(ts.transitions_relation),
+            "silent": len(ts.silent_marking)}
+
+
+def run_simulate(net, options):
+    """Random firing sequence, reproducible through the seed"""
+    placeindex = net.get_place_index_mapping()
+    rng = Random(options["seed"])
+    marking = list(net.init_marking)
+    fired = []
+    for _ in range(0, options["steps"]):
+        enabled = [t for t in net.transitions if t.can_fire(marking, placeindex)]
+        if not enabled:
+            break
+        t = enabled[rng.randint(0, len(enabled) - 1)]
+        marking = t.fire(marking, placeindex)
+        fired.append(t.name)
+    return {"fired": fired, "marking": marking, "terminal": len(fired) < options["steps"]}
+
+
+def run_deadlock(net, options):
+    """Check if a reachable marking enables no transition"""
+    deadlocks = deadlocks_of(*net.reachability_graph_edges(options["symmetry"]))
+    return {"deadlock": bool(deadlocks), "witness": deadlocks[0] if deadlocks else None}
+
+
+def run_reach(net, options):
+    """Check if the target marking is reachable"""
+    if options["target"] == None:
+        raise Exception("The reach job needs --target")
+    target = net.marking_from_string(options["target"])
+    states, graph_edges = net.reachability_graph_edges(options["symmetry"])
+    if options["symmetry"] != None:
+        target = options["symmetry"].canonical(target)
+    return {"target": target, "reachable": target in states}
+
+
+def run_coverability(net, options):
+    """Boundedness and place bounds from the minimal coverability set"""
+    cg = CoverGraph(net)
+    minimal_set = cg.build_minimal_set()
+    placeindex = net.get_place_index_mapping()
+    bounds = {}
+    for p in net.places:
+        b = max(m[placeindex[p]] for m in minimal_set)
+        bounds[p.name] = "omega" if b == OMEGA else b
+    return {"bounded": not any(OMEGA in m for m in minimal_set), "place_bounds": bounds,
+            "minimal_set": len(minimal_set)}
+
+
+def run_unfolding(net, options):
+    """Size of the complete finite prefix, deadlock and target reachability on it"""
+    unf = Unfolding(net)
+    res = {"events": len(unf.ev_trans), "conditions": len(unf.cond_place),
+           "cutoffs": sum(1 for x in unf.ev_cutoff if x)}
+    witness = unf.find_deadlock()
+    res["deadlock"] = witness != None
+    res["witness"] = witness
+    if options["target"] != None:
+        res["reachable"] = unf.is_reachable(options["target"])
+    return res
+
+
+JOBS = {
+    "reachability": run_reachability,
+    "ts": run_ts,
+    "simulate": run_simulate,
+    "deadlock": run_deadlock,
+    "reach": run_reach,
+    "coverability": run_coverability,
+    "unfolding": run_unfolding,
+}
+
+#===============================================================================
+
+def _on_alarm(signum, frame):
+    raise JobTimeout()
+
+
+def run_job(job):
+    """Run one job of the sweep inside a worker process
+        @param job: a dict with the job name, net spec, initial marking, bound and limits
+        @return: a JSON-serializable dict
+    """
+    out = {"job": job["job"], "net": job["net"], "init": job["init"], "bound": job["bound"]}
+    start = time.time()
+    if resource != None and job["memory"]:
+        limit = job["memory"]*1024*1024
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    if hasattr(signal, "SIGALRM") and job["timeout"]:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(job["timeout"])
+    try:
+        net = load_net(job["net"], job["bound"])
+        if job["init"] != None:
+            net.set_init_from_string(job["init"])
+        out["places"] = [p.name for p in net.places]
+        if job["symmetry"]:
+            job["symmetry"] = Symmetry(net)
+        else:
+            job["symmetry"] = None
+        out["result"] = JOBS[job["job"]](net, job)
+        out["status"] = "ok"
+    except JobTimeout:
+        out["status"] = "timeout"
+    except MemoryError:
+        out["status"] = "memory"
+    except Exception as e:
+        out["status"] = "error"
+        out["error"] = str(e)
+    finally:
+        if hasattr(signal, "SIGALRM"):
+            signal.alarm(0)
+    out["seconds"] = round(time.time() - start, 3)
+    return out
+
+
+def build_sweep(args):
+    """Expand the command line into the list of jobs of the sweep"""
+    sweep = []
+    for name, net, init, bound in itertools.product(args.job, args.nets,
+                                                    args.init or [None], args.bound or [1]):
+        sweep.append({"job": name, "net": net, "init": init, "bound": bound,
+                      "steps": args.steps, "seed": args.seed, "target": args.target,
+                      "timeout": args.timeout, "memory": args.memory,
+                      "symmetry": args.symmetry})
+    return sweep
+
+
+def main(argv = None):
+    """Parse the command line, run the sweep and return the exit code"""
+    parser = argparse.ArgumentParser(description = "Run Petri net analysis jobs without a display.")
+    parser.add_argument("nets", nargs = "+",
+                        help = "net files (.pnml or .pns), comma-separated files are merged")
+    parser.add_argument("--job", action = "append", choices = sorted(JOBS),
+                        help = "job to run, repeat to sweep over several (default: reachability)")
+    parser.add_argument("--init", action = "append",
+                        help = "initial marking such as [1.p1,2.p2], repeat to sweep")
+    parser.add_argument("--bound", action = "append", type = int,
+                        help = "token bound, repeat to sweep (default: 1)")
+    parser.add_argument("--target", help = "marking for the reach and unfolding jobs")
+    parser.add_argument("--steps", type = int, default = 100, help = "steps of the simulate job")
+    parser.add_argument("--seed", type = int, default = 0, help = "random seed of the simulate job")
+    parser.add_argument("--symmetry", action = "store_true",
+                        help = "keep one marking per orbit of replicated components")
+    parser.add_argument("--processes", type = int, default = None, help = "worker processes")
+    parser.add_argument("--timeout", type = int, default = 0, help = "seconds per job, 0 for none")
+    parser.add_argument("--memory", type = int, default = 0, help = "MB of memory per job, 0 for none")
+    parser.add_argument("--output", help = "write the JSON lines to this file instead of stdout")
+    args = parser.parse_args(argv)
+    args.job = args.job or ["reachability"]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    failed = 0
+    # one task per child so memory limits and leaked state do not carry over
+    with Pool(args.processes, maxtasksperchild = 1) as pool:
+        for result in pool.imap(run_job, build_sweep(args)):
+            if result["status"] != "ok":
+                failed += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    if out is not sys.stdout:
+        out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
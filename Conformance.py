@@ -0,0 +1,316 @@
+'''
+Token-replay conformance checking of event logs against a Petri net.
+Each trace of the log is replayed on the net, starting from its initial marking,
+and the missing, remaining, consumed and produced tokens are counted.
+Logs are streamed from CSV or XES files one trace at a time, identical trace
+variants are replayed only once, and batches of variants are spread over a pool
+of worker processes.
+'''
+
+'''
+Overall structure of the source code:
+    1. compile_net turns a Petrinet into plain index lists that workers can use
+    2. read_csv_traces / read_xes_traces stream traces from a log file
+    3. replay_trace replays a single trace on the compiled net
+    4. Class ReplayResult accumulates the token counts of a log
+    5. Class TokenReplay batches, caches and distributes the replay
+'''
+
+import csv
+import os
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+from Persistence import local_name
+#===============================================================================
+
+def compile_net(net, final_marking = None):
+    """Compile a Petri net into index lists for fast replay
+        @param net: the Petri net
+        @param final_marking: the marking expected at the end of a trace, as a list or
+                              a string such as [1.end]; if None, one token on every sink
+                              place, which the environment consumes as in classic token replay
+        @return: (initial marking, {transition name: (preset, postset)}, final marking)
+                 where preset and postset hold place indices, one per arc
+    """
+    placeindex = net.get_place_index_mapping()
+    transitions = {}
+    consumed = set()
+    for t in net.transitions:
+        pre = [placeindex[arc.frm] for arc in t.incoming_arcs]
+        post = [placeindex[arc.to] for arc in t.outgoing_arcs]
+        transitions[t.name] = (pre, post)
+        consumed.update(pre)
+    if isinstance(final_marking, str):
+        final_marking = net.marking_from_string(final_marking)
+    elif final_marking == None:
+        final_marking = [0 if i in consumed else 1 for i in range(0, len(placeindex))]
+    if len(final_marking) != len(placeindex):
+        raise Exception("The final marking does not match the places of the net")
+    return tuple(net.init_marking), transitions, tuple(final_marking)
+
+
+def replay_trace(compiled, trace, final_marking = None):
+    """Replay a trace on a compiled net
+        Tokens are created whenever a transition is not enabled, place bounds are ignored
+        @param compiled: the result of compile_net
+        @param trace: a sequence of activity names
+        @param final_marking: the marking expected at the end, the compiled one if None
+        @return: (missing, remaining, consumed, produced, unknown events)
+    """
+    init, transitions, final = compiled
+    marking = list(init)
+    missing = 0
+    consumed = 0
+    produced = sum(init)
+    unknown = 0
+    for activity in trace:
+        t = transitions.get(activity)
+        if t == None:
+            unknown += 1
+            continue
+        pre, post = t
+        for i in pre:
+            if marking[i] == 0:
+                missing += 1
+            else:
+                marking[i] -= 1
+            consumed += 1
+        for i in post:
+            marking[i] += 1
+        produced += len(post)
+    remaining = 0
+    if final_marking == None:
+        final_marking = final
+    for i in range(0, len(marking)):
+        if marking[i] < final_marking[i]:
+            missing += final_marking[i] - marking[i]
+        else:
+            remaining += marking[i] - final_marking[i]
+        consumed += final_marking[i]
+    return missing, remaining, consumed, produced, unknown
+
+#===============================================================================
+
+def read_csv_traces(path, case_column = "case:concept:name",
+                    activity_column = "concept:name", delimiter = ","):
+    """Stream the traces of a CSV event log
+        The rows must be grouped by case, as exported by most tools, so only one trace
+        is held in memory at a time; a case that reappears after another case started
+        raises an exception, sort the log by case id first
+        @param path: the CSV file
+        @param case_column: the column holding the case id
+        @param activity_column: the column holding the activity name
+        @return: a generator of (case id, list of activities)
+    """
+    with open(path, newline = "") as f:
+        reader = csv.DictReader(f, delimiter = delimiter)
+        case = None
+        trace = []
+        finished = set()
+        for row in reader:
+            if row[case_column] != case:
+                if case != None:
+                    finished.add(case)
+                    yield case, trace
+                case = row[case_column]
+                if case in finished:
+                    raise Exception("Case " + case + " is not on consecutive rows of " + path)
+                trace = []
+            trace.append(row[activity_column])
+        if case != None:
+            yield case, trace
+
+
+def read_xes_traces(path, activity_key = "concept:name"):
+    """Stream the traces of an XES event log
+        Each trace is removed from the tree once it is read to keep memory bounded
+        @param path: the XES file
+        @param activity_key: the event attribute holding the activity name
+        @return: a generator of (case id, list of activities)
+    """
+    case = None
+    trace = []
+    depth = 0
+    root = None
+    for ev, elem in ET.iterparse(path, events = ("start", "end")):
+        tag = local_name(elem.tag)
+        if ev == "start":
+            if root == None:
+                root = elem
+            elif tag == "trace":
+                case = None
+                trace = []
+            elif tag == "event":
+                depth += 1
+            continue
+        if tag == "string" and elem.get("key") == activity_key:
+            if depth > 0:
+                trace.append(elem.get("value"))
+            else:
+                case = elem.get("value")
+        elif tag == "event":
+            depth -= 1
+            elem.clear()
+        elif tag == "trace":
+            yield case, trace
+            # cleared traces would otherwise stay attached to the log element
+            root.clear()
+
+
+def read_traces(path, **kwargs):
+    """Stream the traces of a log file, the format is chosen by extension
+        @param path: a .csv or .xes file
+    """
+    if path.lower().endswith(".xes"):
+        return read_xes_traces(path, **kwargs)
+    if path.lower().endswith(".csv"):
+        return read_csv_traces(path, **kwargs)
+    raise Exception("Unsupported log format: " + path)
+
+#===============================================================================
+
+class ReplayResult:
+    """Token counts of a replayed log"""
+
+    def __init__(self):
+        self.traces = 0
+        self.fitting_traces = 0
+        self.missing = 0
+        self.remaining = 0
+        self.consumed = 0
+        self.produced = 0
+        self.unknown_events = 0
+
+    def add(self, counts, times = 1):
+        """Add the counts of a trace replayed a number of times
+            @param counts: a result of replay_trace
+            @param times: how many traces share these counts
+        """
+        m, r, c, p, u = counts
+        self.traces += times
+        # skipped events are not explained by the net, so such traces do not fit
+        if m == 0 and r == 0 and u == 0:
+            self.fitting_traces += times
+        self.missing += m*times
+        self.remaining += r*times
+        self.consumed += c*times
+        self.produced += p*times
+        self.unknown_events += u*times
+
+    def fitness(self):
+        """Token-based replay fitness, 1 when every trace fits"""
+        f = 1.0
+        if self.consumed:
+            f -= 0.5*self.missing/self.consumed
+        if self.produced:
+            f -= 0.5*self.remaining/self.produced
+        return f
+
+    def __str__(self):
+        return ("traces = " + str(self.traces)
+                + ", fitting = " + str(self.fitting_traces)
+                + ", missing = " + str(self.missing)
+                + ", remaining = " + str(self.remaining)
+                + ", consumed = " + str(self.consumed)
+                + ", produced = " + str(self.produced)
+                + ", unknown events = " + str(self.unknown_events)
+                + ", fitness = " + str(round(self.fitness(), 4)))
+
+#===============================================================================
+
+_worker_net = None
+
+
+def _init_worker(compiled):
+    """Store the compiled net once per worker process"""
+    global _worker_net
+    _worker_net = compiled
+
+
+def _replay_batch(variants):
+    """Replay a batch of variants inside a worker process"""
+    return [replay_trace(_worker_net, v) for v in variants]
+
+
+class TokenReplay:
+    """Token-replay conformance checker for a Petri net.
+        >>> tr = TokenReplay(net)
+        >>> result = tr.replay_file("log.csv")
+    """
+
+    def __init__(self, net, final_marking = None, batch_size = 1000,
+                 processes = None, cache_size = 100000):
+        """Compile the net and set up the replay
+            @param net: the Petri net used as process model
+            @param final_marking: the marking expected after each trace, as a list or a
+                                  string such as [1.end]; one token per sink place if None
+            @param batch_size: number of traces grouped into one job
+            @param processes: worker processes, os.cpu_count() if None, in-process if 1
+            @param cache_size: maximum number of trace variants kept in the cache
+        """
+        self.compiled = compile_net(net, final_marking)
+        self.final_marking = list(self.compiled[2])
+        self.batch_size = batch_size
+        self.processes = processes or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.cache = {}
+
+    def replay_file(self, path, **kwargs):
+        """Replay every trace of a CSV or XES log
+            @param path: the log file
+            @param kwargs: passed on to the log reader
+        """
+        return self.replay(trace for case, trace in read_traces(path, **kwargs))
+
+    def replay(self, traces):
+        """Replay a stream of traces and return a ReplayResult
+            @param traces: an iterable of activity sequences
+        """
+        result = ReplayResult()
+        if self.processes == 1:
+            for batch in self._batches(traces):
+                self._collect(result, batch, self._replay_local(batch))
+            return result
+        # at most two batches per worker are in flight to keep memory bounded
+        pending = []
+        with Pool(self.processes, _init_worker, (self.compiled,)) as pool:
+            for batch in self._batches(traces):
+                todo = [v for v in batch if v not in self.cache]
+                pending.append((batch, todo, pool.apply_async(_replay_batch, (todo,))))
+                if len(pending) >= 2*self.processes:
+                    batch, todo, job = pending.pop(0)
+                    self._collect(result, batch, dict(zip(todo, job.get())))
+            for batch, todo, job in pending:
+                self._collect(result, batch, dict(zip(todo, job.get())))
+        return result
+
+    def _batches(self, traces):
+        """Group traces into batches of {variant: count}"""
+        batch = {}
+        n = 0
+        for trace in traces:
+            v = tuple(trace)
+            batch[v] = batch.get(v, 0) + 1
+            n += 1
+            if n == self.batch_size:
+                yield batch
+                batch = {}
+                n = 0
+        if batch:
+            yield batch
+
+    def _replay_local(self, batch):
+        """Replay the uncached variants of a batch in this process"""
+        return {v: replay_trace(self.compiled, v)
+                for v in batch if v not in self.cache}
+
+    def _collect(self, result, batch, replayed):
+        """Add a batch to the result and cache the new variants"""
+        for v, counts in replayed.items():
+            if len(self.cache) < self.cache_size:
+                self.cache[v] = counts
+        for v, times in batch.items():
+            counts = replayed.get(v)
+            if counts == None:
+                counts = self.cache[v]
+            result.add(counts, times)
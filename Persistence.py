@@ -0,0 +1,296 @@
+'''
+Saving and loading of Petri nets and their analysis results.
+    1. PNML import/export of net definitions (place/transition nets)
+    2. A compact binary snapshot of a compiled net together with a reachability
+       graph or TS relation, stored as flat int32 arrays that are read back
+       through memory mapping without parsing
+'''
+
+'''
+Snapshot layout, all integers are little-endian:
+    header:   magic "PNSNAP01", then P, T, S, E, bound as uint32
+    names:    uint32 byte length, then place and transition names, utf-8, "\\n" separated
+    arrays:   int32 arrays, each starting on an 8-byte boundary, in order
+              init marking (P), pre_ptr (T+1), pre_idx, post_ptr (T+1), post_idx,
+              states (S*P), edge_src (E), edge_trans (E), edge_dst (E)
+pre_ptr/pre_idx (and post_ptr/post_idx) list the places of the input (output) arcs of
+every transition, one entry per arc: the arcs of transition t are
+pre_idx[pre_ptr[t]:pre_ptr[t+1]].
+Edges refer to rows of the states matrix and to transition indices.
+'''
+
+import mmap
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from Petrinet import Petrinet
+#===============================================================================
+
+PNML_NS = "http://www.pnml.org/version-2009/grammar/pnml"
+PTNET_TYPE = "http://www.pnml.org/version-2009/grammar/ptnet"
+
+
+def _text(parent, tag, value):
+    """Add a <tag><text>value</text></tag> child"""
+    ET.SubElement(ET.SubElement(parent, tag), "text").text = str(value)
+
+
+def write_pnml(net, path, name = "net"):
+    """Export the net definition and initial marking to a PNML file
+        Parallel arcs between the same nodes are written as one arc with an inscription
+        @param net: the Petri net
+        @param path: the output file
+        @param name: the id of the net element
+    """
+    root = ET.Element("pnml", xmlns = PNML_NS)
+    page = ET.SubElement(ET.SubElement(root, "net", id = name, type = PTNET_TYPE),
+                         "page", id = "page0")
+    place_idx = net.get_place_index_mapping()
+    for p in place_idx:
+        node = ET.SubElement(page, "place", id = "p" + str(place_idx[p]))
+        _text(node, "name", p.name)
+        if net.init_marking[place_idx[p]]:
+            _text(node, "initialMarking", net.init_marking[place_idx[p]])
+    trans_id = {}
+    for i in range(0, len(net.transitions)):
+        t = net.transitions[i]
+        trans_id[t] = "t" + str(i)
+        _text(ET.SubElement(page, "transition", id = trans_id[t]), "name", t.name)
+    weights = {}
+    for t in net.transitions:
+        for arc in t.incoming_arcs:
+            key = ("p" + str(place_idx[arc.frm]), trans_id[t])
+            weights[key] = weights.get(key, 0) + 1
+        for arc in t.outgoing_arcs:
+            key = (trans_id[t], "p" + str(place_idx[arc.to]))
+            weights[key] = weights.get(key, 0) + 1
+    i = 0
+    for (source, target), w in weights.items():
+        node = ET.SubElement(page, "arc", id = "a" + str(i), source = source, target = target)
+        if w > 1:
+            _text(node, "inscription", w)
+        i += 1
+    ET.ElementTree(root).write(path, encoding = "utf-8", xml_declaration = True)
+
+
+def local_name(tag):
+    """Strip the XML namespace of a tag"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem, tag):
+    """Return the <text> of a child element, None if absent"""
+    for child in elem:
+        if local_name(child.tag) == tag:
+            for t in child:
+                if local_name(t.tag) == "text":
+                    return t.text
+    return None
+
+
+def read_pnml(path, bound = 1):
+    """Import a place/transition net from a PNML file
+        Only the first net is read, pages are flattened
+        @param path: the PNML file
+        @param bound: the token bound of the created Petri net
+        @return: a Petrinet object
+    """
+    net = Petrinet(bound)
+    pnml_net = None
+    for elem in ET.parse(path).getroot().iter():
+        if local_name(elem.tag) == "net":
+            pnml_net = elem
+            break
+    if pnml_net == None:
+        raise Exception("No net found in " + path)
+    nodes = {}
+    marking = {}
+    arcs = []
+    # names are only labels, so the marking is kept per place object
+    for elem in pnml_net.iter():
+        tag = local_name(elem.tag)
+        if tag == "place":
+            place = net.place(_child_text(elem, "name") or elem.get("id"))
+            nodes[elem.get("id")] = place
+            marking[place] = int(_child_text(elem, "initialMarking") or 0)
+        elif tag == "transition":
+            nodes[elem.get("id")] = net.transition(_child_text(elem, "name") or elem.get("id"))
+        elif tag == "arc":
+            arcs.append(elem)
+    for elem in arcs:
+        source = nodes.get(elem.get("source"))
+        target = nodes.get(elem.get("target"))
+        if source == None or target == None:
+            raise Exception("Arc " + str(elem.get("id")) + " refers to an unknown node")
+        io = "output" if source in net.transitions else "input"
+        for _ in range(0, int(_child_text(elem, "inscription") or 1)):
+            net.arc(source, target, io)
+    place_idx = net.get_place_index_mapping()
+    for p in net.places:
+        p.tokens = marking[p]
+        net.init_marking[place_idx[p]] = p.tokens
+    return net
+
+#===============================================================================
+
+MAGIC = b"PNSNAP01"
+_HEADER = struct.Struct("<8s5I")
+
+
+def _pad(buf):
+    """Pad a bytearray to the next 8-byte boundary"""
+    buf.extend(b"\0"*(-len(buf) % 8))
+
+
+def save_snapshot(path, net, relation = None, states = None):
+    """Write a compiled net and its state graph to a binary snapshot
+        @param path: the output file
+        @param net: the Petri net
+        @param relation: a list of [marking, transition, marking] triples, as in
+                         TranSys.transitions_relation; the reachability graph if None
+        @param states: markings stored before those of the relation, so states without
+                       transitions are kept, e.g. TranSys.statespace
+    """
+    if sys.byteorder != "little":
+        raise Exception("Snapshots are only supported on little-endian machines")
+    place_idx = net.get_place_index_mapping()
+    trans_idx = {}
+    for t in net.transitions:
+        trans_idx[t] = len(trans_idx)
+    if relation == None:
+        seen, graph_edges = net.reachability_graph_edges()
+        relation = [[u, t, v] for u, v, t in graph_edges]
+    else:
+        seen = []
+    if states != None:
+        seen = list(states) + seen
+    state_idx = {}
+    for u in seen:
+        state_idx.setdefault(tuple(u), len(state_idx))
+    for u, t, v in relation:
+        state_idx.setdefault(tuple(u), len(state_idx))
+        state_idx.setdefault(tuple(v), len(state_idx))
+    pre_ptr, pre_idx, post_ptr, post_idx = array("i", [0]), array("i"), array("i", [0]), array("i")
+    for t in net.transitions:
+        pre_idx.extend(place_idx[arc.frm] for arc in t.incoming_arcs)
+        post_idx.extend(place_idx[arc.to] for arc in t.outgoing_arcs)
+        pre_ptr.append(len(pre_idx))
+        post_ptr.append(len(post_idx))
+    states = array("i")
+    for s in state_idx:
+        states.extend(s)
+    src, trans, dst = array("i"), array("i"), array("i")
+    for u, t, v in relation:
+        src.append(state_idx[tuple(u)])
+        trans.append(trans_idx[t])
+        dst.append(state_idx[tuple(v)])
+    names = "\n".join([p.name for p in place_idx] + [t.name for t in net.transitions]).encode("utf-8")
+
+    buf = bytearray(_HEADER.pack(MAGIC, len(place_idx), len(net.transitions),
+                                 len(state_idx), len(relation), net.bound))
+    buf.extend(struct.pack("<I", len(names)))
+    buf.extend(names)
+    for a in (array("i", net.init_marking), pre_ptr, pre_idx, post_ptr, post_idx,
+              states, src, trans, dst):
+        _pad(buf)
+        buf.extend(a.tobytes())
+    with open(path, "wb") as f:
+        f.write(buf)
+
+
+class Snapshot:
+    """A binary snapshot mapped into memory.
+        Arrays are int32 memoryviews over the file, nothing is copied until used.
+        The mapping is released by close(), or at the end of a with block.
+        >>> with Snapshot("model.pns") as snap:
+        ...     net = snap.to_net()
+    """
+
+    def __init__(self, path):
+        """Map the file and locate its arrays
+            @param path: a file written by save_snapshot
+        """
+        if sys.byteorder != "little":
+            raise Exception("Snapshots are only supported on little-endian machines")
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        view = memoryview(self.buffer)
+        # every view over the mapping must be released before it can be closed
+        self.views = [view]
+        magic, P, T, S, E, self.bound = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise Exception(path + " is not a Petri net snapshot")
+        off = _HEADER.size
+        (n,) = struct.unpack_from("<I", view, off)
+        off += 4
+        with view[off:off + n] as raw:
+            names = bytes(raw).decode("utf-8").split("\n")
+        off += n
+        self.place_names = names[:P]
+        self.transition_names = names[P:P + T]
+
+        def take(count):
+            nonlocal off
+            off += -off % 8
+            raw = view[off:off + 4*count]
+            a = raw.cast("i")
+            self.views.extend([raw, a])
+            off += 4*count
+            return a
+
+        self.init_marking = take(P)
+        self.pre_ptr = take(T + 1)
+        self.pre_idx = take(self.pre_ptr[T])
+        self.post_ptr = take(T + 1)
+        self.post_idx = take(self.post_ptr[T])
+        self.states = take(S*P)
+        self.edge_src = take(E)
+        self.edge_trans = take(E)
+        self.edge_dst = take(E)
+        self.num_places = P
+        self.num_states = S
+
+    def close(self):
+        """Release the arrays and unmap the file"""
+        for v in reversed(self.views):
+            v.release()
+        self.views = []
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def state(self, i):
+        """Return the marking of state i as a list"""
+        return self.states[i*self.num_places:(i + 1)*self.num_places].tolist()
+
+    def relation(self):
+        """Return the stored relation as [marking, transition name, marking] triples"""
+        return [[self.state(self.edge_src[e]), self.transition_names[self.edge_trans[e]],
+                 self.state(self.edge_dst[e])] for e in range(0, len(self.edge_src))]
+
+    def to_net(self, bound = None):
+        """Rebuild the Petrinet object of the snapshot
+            @param bound: the token bound of the net, the stored bound if None
+        """
+        net = Petrinet(self.bound if bound == None else bound)
+        places = [net.place(name) for name in self.place_names]
+        for t in range(0, len(self.transition_names)):
+            tr = net.transition(self.transition_names[t])
+            for i in self.pre_idx[self.pre_ptr[t]:self.pre_ptr[t + 1]]:
+                net.arc(places[i], tr, "input")
+            for i in self.post_idx[self.post_ptr[t]:self.post_ptr[t + 1]]:
+                net.arc(tr, places[i], "output")
+        for i in range(0, len(places)):
+            places[i].tokens = self.init_marking[i]
+            net.init_marking[i] = self.init_marking[i]
+        return net
+
+
+def load_snapshot(path):
+    """Load a binary snapshot through memory mapping"""
+    return Snapshot(path)
@@ -9,9 +9,10 @@ Interface module is available at:
 
 '''
 Overall structure of the source code:
-The two main classes are:
+The main classes are:
     1. Class Petrinet
     2. Class TranSys
+    3. Class CoverGraph, the coverability graph for nets that may be unbounded
 The behaviors of Petri nets revolves around smaller classes:
     1. Class Place
     2. Class Transition
@@ -25,6 +26,7 @@ from copy import deepcopy
 from IPython import display
 from PIL import Image
 from random import randint
+from collections import deque
 import time
 #===============================================================================
 
@@ -295,29 +297,43 @@ class Petrinet:
         self.placeindex = self.get_place_index_mapping()
         return self.init_marking
 
-    def reachability_graph_generate(self, mode = "text", engine = 'dot'):
-        """Build a reachability graph and pass it onto graphviz for rendering.
-           See http://www.graphviz.org/ for more information.
-           @param mode: 'text' or 'graph'.
-           @param engine: the graphviz engine to use: 'dot' by default.
+    def reachability_graph_edges(self, symmetry = None):
+        """Explore the markings reachable from the initial marking
+            @param symmetry: a Symmetry object, only one marking per orbit is kept if given
+            @return: the reachable markings and the list of [marking, marking, transition] edges
         """
-        queue = []
         seen = []
+        visited = set()
         graph_edges = []
-        queue.append(self.find_initial_state())
-        while len(queue) != 0:
-            u = queue.pop(0)
-            if u in seen:
-                continue
-            else:
-                seen.append(u)
-            self.graph_RG.node(str(u))
+        u = self.find_initial_state()
+        if symmetry != None:
+            u = symmetry.canonical(u)
+        queue = deque([u])
+        visited.add(tuple(u))
+        while queue:
+            u = queue.popleft()
+            seen.append(u)
             for transition in self.transitions:
                 if transition.can_fire(u, self.placeindex):
                     v = transition.fire(u, self.placeindex)
+                    if symmetry != None:
+                        v = symmetry.canonical(v)
                     graph_edges.append([u, v, transition])
-                    if v not in seen:
+                    if tuple(v) not in visited:
+                        visited.add(tuple(v))
                         queue.append(v)
+        return seen, graph_edges
+
+    def reachability_graph_generate(self, mode = "text", engine = 'dot', symmetry = None):
+        """Build a reachability graph and pass it onto graphviz for rendering.
+           See http://www.graphviz.org/ for more information.
+           @param mode: 'text' or 'graph'.
+           @param engine: the graphviz engine to use: 'dot' by default.
+           @param symmetry: a Symmetry object to build the quotient graph, None by default.
+        """
+        seen, graph_edges = self.reachability_graph_edges(symmetry)
+        for u in seen:
+            self.graph_RG.node(str(u))
         self.print_graph(graph_edges, mode, engine)
 
     def print_definition(self):
@@ -395,13 +411,13 @@ class Petrinet:
         self.graph_PN.engine = engine
         display.display(self.graph_PN)
         
-    def set_init_from_string(self, marking):
-        ''' set initial marking from string
+    def marking_from_string(self, marking):
+        ''' parse a marking string into a marking list
             ex: [1.place1,2.place2,3.place3]
         '''
         marking = marking[1:-1]
         marking = marking.split(",")
-        self.init_marking = [0]*len(self.places)
+        mrk = [0]*len(self.places)
         place_idx = self.get_place_index_mapping()
         for i in marking:
             token = int(i[0])
@@ -409,8 +425,16 @@ class Petrinet:
             place = self.get_place_by_name(i)
             if place == None:
                 raise Exception("Place "+ i +" not found")
-            place.tokens = token
-            self.init_marking[place_idx[place]] = token
+            mrk[place_idx[place]] = token
+        return mrk
+
+    def set_init_from_string(self, marking):
+        ''' set initial marking from string
+            ex: [1.place1,2.place2,3.place3]
+        '''
+        self.init_marking = self.marking_from_string(marking)
+        for place, i in self.get_place_index_mapping().items():
+            place.tokens = self.init_marking[i]
     
     def detect_enabled(self):
         """Detects the enabled transitions in the Petri net
@@ -444,6 +468,7 @@ class Petrinet:
             @param net: the Petri net to be merged with the current Petri net
             Using deepcopy to copy the net object
             Simply adding the places and transitions of the net to the current net
+            Transitions with the same name are merged into one
         """
         merged_trans = []
         merged_places = []
@@ -460,9 +485,11 @@ class Petrinet:
         for t in t2:
             t2_names.append(t.name)
 
-        for t in t1:
+        # transitions only found in net are copied like those only found in self
+        t2_only = [x for x in t2 if x.name not in t1_names]
+        for t in t1 + t2_only:
             new_t = Transition(t.name)
-            if t.name in t2_names:
+            if t.name in t2_names and t not in t2_only:
                 t2t = next((x for x in t2 if x.name == t.name), None)
 
                 in_arcs1 = t.incoming_arcs.copy()
@@ -593,6 +620,7 @@ class TranSys:
         self.transitions_relation = []
         self.bound = net.bound
         self.silent_marking = []
+        self.successors = {}
         self.build_statespace()
         self.build_transition_relation()
 
@@ -625,55 +653,61 @@ class TranSys:
             place.tokens = token
             self.init_marking[place_idx[place]] = token
             
+    def successors_of(self, marking):
+        """Return the (transition, marking) pairs reachable in one step
+            Results are cached per marking so every state is expanded once
+            @param marking: the marking to expand
+        """
+        key = tuple(marking)
+        succ = self.successors.get(key)
+        if succ is None:
+            succ = []
+            for transition in self.transitions:
+                if transition.can_fire(marking, self.placeindex):
+                    succ.append((transition, transition.fire(marking, self.placeindex)))
+            self.successors[key] = succ
+        return succ
+
+    def explore_from_seeds(self, seeds):
+        """Forward closure of several seed markings in a single pass
+            Visited states are shared across seeds, so each state is expanded once
+            @param seeds: the markings to explore from, in order
+            @return: the visited markings in BFS order, and a dict mapping each
+                     marking (as a tuple) to the index of the seed that reached it first
+        """
+        order = []
+        component = {}
+        for idx, seed in enumerate(seeds):
+            if tuple(seed) in component:
+                continue
+            component[tuple(seed)] = idx
+            queue = deque([seed])
+            while queue:
+                u = queue.popleft()
+                order.append(u)
+                for transition, v in self.successors_of(u):
+                    if tuple(v) not in component:
+                        component[tuple(v)] = idx
+                        queue.append(v)
+        return order, component
+
     def build_transition_relation(self):
         """Generate the relation between places and transitions"""
-        queue = []
-        seen = []
         relation = []
-        queue_space= deepcopy(self.statespace)
-        while queue_space:
-            u = queue_space.pop(0)
-            if u in seen:
-                continue
-            queue.append(u)
-            while len(queue) != 0:
-                u = queue.pop(0)
-                if u in seen:
-                    continue
-                else:
-                    seen.append(u)
-                for transition in self.transitions:
-                    if transition.can_fire(u, self.placeindex):
-                        v = transition.fire(u, self.placeindex)
-                        relation.append([u, transition, v])
-                        if v not in seen:
-                            queue.append(v)
+        targets = set()
+        order, component = self.explore_from_seeds(self.statespace)
+        for u in order:
+            for transition, v in self.successors_of(u):
+                relation.append([u, transition, v])
+                targets.add(tuple(v))
         # transition_relation: ([1,1,0], start, [1,0,1])
-        self.transitions_relation = deepcopy(relation)
-        for mar,tra,mar1 in relation:
-            if mar in seen:
-                seen.remove(mar)
-            if mar1 in seen:
-                seen.remove(mar1)
-        self.silent_marking = seen
+        self.transitions_relation = relation
+        self.silent_marking = [u for u in order
+                               if not self.successors_of(u) and tuple(u) not in targets]
     
     def build_transys_sequence_from_marking(self, marking):
         """Generate a set of markings from a given initial marking"""
-        queue = []
-        seen = []
-        queue.append(marking)
-        while len(queue) != 0:
-            u = queue.pop(0)
-            if u in seen:
-                continue
-            else:
-                seen.append(u)
-            for transition in self.transitions:
-                if transition.can_fire(u, self.placeindex):
-                    v = transition.fire(u, self.placeindex)
-                    if v not in seen:
-                        queue.append(v)  
-        return seen
+        return self.explore_from_seeds([marking])[0]
 
     def get_place_index_mapping(self):
         """Place index map, works for both Petri nets and TranSys"""
@@ -758,16 +792,15 @@ class TranSys:
             print("State-transition system of given Petri net: \n")
             print("The position of each place: ", end="")
         self.print_placemap()
-        seen = []
-        tmp = []
         if init_mrk != None:
-            seen = (self.build_transys_sequence_from_marking(init_mrk))
-            for s in self.statespace:
-                if s not in seen:
-                    tmp = (self.build_transys_sequence_from_marking(s))
-                    for t in tmp:
-                        seen.append(t)
-                    self.ts_graph_generate(tmp,mode)
+            # seed 0 is the given marking, the others are the remaining states
+            order, component = self.explore_from_seeds([init_mrk] + self.statespace)
+            groups = {}
+            for u in order:
+                groups.setdefault(component[tuple(u)], []).append(u)
+            for idx in sorted(groups):
+                if idx != 0:
+                    self.ts_graph_generate(groups[idx],mode)
         else:
             for place in self.silent_marking:
                 if mode == "text":
@@ -792,10 +825,9 @@ class TranSys:
         """
         found = False
         for i in init:
-            for y in self.transitions_relation:
-                if i == y[0]:
-                    found = True
-                    print(str(i) + "--" + y[1].name + "-->" + str(y[2]))
+            for transition, v in self.successors_of(i):
+                found = True
+                print(str(i) + "--" + transition.name + "-->" + str(v))
         if not found:
             print(str(init[0]) + "--" + "None" + "-->")
             
@@ -805,9 +837,162 @@ class TranSys:
         """
         found = False
         for i in init:
-            for y in self.transitions_relation:
-                if i == y[0]:
-                    found = True
-                    self.graph_TS.edge(str(i),str(y[2]),y[1].name)
+            for transition, v in self.successors_of(i):
+                found = True
+                self.graph_TS.edge(str(i),str(v),transition.name)
         if not found:
-            self.graph_TS.node(str(init[0]))
\ No newline at end of file
+            self.graph_TS.node(str(init[0]))
+#===============================================================================
+
+OMEGA = float("inf")
+
+class CoverGraph:
+    """A coverability graph (Karp-Miller) of a Petri net.
+       Place bounds are ignored, unbounded places get the value OMEGA.
+    """
+
+    def __init__(self, net):
+        """Takes the structure and the initial marking of the Petri net.
+           >>> cg = CoverGraph(net)
+        """
+        self.net = net
+        self.places = net.places
+        self.transitions = net.transitions
+        self.init_marking = list(net.init_marking)
+        self.placeindex = net.get_place_index_mapping()
+        self.graph_CG = graphviz.Digraph("coverability")
+        self.nodes = []
+        self.edges = []
+        self.minimal_set = []
+        self.preset = {}
+        for t in self.transitions:
+            need = [0]*len(self.places)
+            for arc in t.incoming_arcs:
+                need[self.placeindex[arc.frm]] += 1
+            self.preset[t] = need
+
+    def enabled(self, marking, transition):
+        """Check if a transition is enabled, ignoring place bounds"""
+        need = self.preset[transition]
+        for i in range(0, len(marking)):
+            if marking[i] < need[i]:
+                return False
+        return True
+
+    def accelerate(self, marking, ancestors):
+        """Set places to OMEGA where the marking strictly covers an ancestor
+            The whole ancestor path is scanned for every new marking, there is no index
+            @param marking: the new marking
+            @param ancestors: the markings on the path from the initial marking
+        """
+        for a in ancestors:
+            if a != marking and all(a[i] <= marking[i] for i in range(0, len(a))):
+                marking = [OMEGA if a[i] < marking[i] else marking[i]
+                           for i in range(0, len(a))]
+        return marking
+
+    def build_graph(self):
+        """Build the Karp-Miller coverability graph
+            Identical markings are merged through a dict, so every node is expanded once;
+            the ancestor path of a node is rebuilt from the parent links and scanned
+            linearly by accelerate
+            @return: the list of nodes
+        """
+        root = tuple(self.init_marking)
+        parent = {root: None}
+        self.nodes = [list(root)]
+        self.edges = []
+        queue = deque([root])
+        while queue:
+            u = queue.popleft()
+            ancestors = []
+            a = u
+            while a != None:
+                ancestors.append(a)
+                a = parent[a]
+            for transition in self.transitions:
+                if self.enabled(u, transition):
+                    v = self.accelerate(transition.fire(u, self.placeindex), ancestors)
+                    self.edges.append([list(u), list(v), transition])
+                    if tuple(v) not in parent:
+                        parent[tuple(v)] = u
+                        self.nodes.append(v)
+                        queue.append(tuple(v))
+        return self.nodes
+
+    def build_minimal_set(self):
+        """Build the minimal coverability set
+            Taken as the maximal markings of the Karp-Miller graph, markings kept so far
+            are grouped by their set of OMEGA places and scanned by covered
+            @return: the list of maximal markings
+        """
+        if not self.nodes:
+            self.build_graph()
+        index = {}
+        self.minimal_set = []
+        # a strictly covering marking has more OMEGA places or more tokens, so it comes first
+        for m in sorted(self.nodes, key = lambda m: (m.count(OMEGA),
+                        sum(x for x in m if x != OMEGA)), reverse = True):
+            w = frozenset(i for i in range(0, len(m)) if m[i] == OMEGA)
+            if not self.covered(m, w, index):
+                index.setdefault(w, []).append(m)
+                self.minimal_set.append(m)
+        return self.minimal_set
+
+    def covered(self, v, w, index):
+        """Check if a marking of the index covers v
+            This is a linear scan: groups whose OMEGA places do not contain w are skipped,
+            every marking of the other groups is compared place by place
+            @param w: the OMEGA places of v, only groups containing it can cover v
+        """
+        for key in index:
+            if w <= key:
+                for m in index[key]:
+                    if all(m[i] >= v[i] for i in range(0, len(v))):
+                        return True
+        return False
+
+    def is_bounded(self):
+        """Check if the Petri net is bounded"""
+        if not self.nodes:
+            self.build_graph()
+        for m in self.nodes:
+            if OMEGA in m:
+                return False
+        return True
+
+    def place_bound(self, name):
+        """Return the maximum number of tokens of a place, OMEGA if unbounded"""
+        place = self.net.get_place_by_name(name)
+        if place == None:
+            raise Exception("Place "+ name +" not found")
+        if not self.nodes:
+            self.build_graph()
+        i = self.placeindex[place]
+        return max(m[i] for m in self.nodes)
+
+    def marking_to_string(self, marking):
+        """Print a marking with OMEGA shown as w"""
+        return "[" + ", ".join("w" if x == OMEGA else str(x) for x in marking) + "]"
+
+    def print_graph(self, mode = "text", engine = 'dot'):
+        """Prints the coverability graph via graphviz or text.
+            @param mode: 'text' or 'graph'.
+            @param engine: the graphviz engine to use: 'dot' by default.
+        """
+        if not self.nodes:
+            self.build_graph()
+        if mode == "graph":
+            for node in self.nodes:
+                self.graph_CG.node(self.marking_to_string(node))
+            for edge in self.edges:
+                self.graph_CG.edge(self.marking_to_string(edge[0]),
+                                   self.marking_to_string(edge[1]), edge[2].name)
+            self.graph_CG.engine = engine
+            display.display(self.graph_CG)
+        else:
+            str_graph = ""
+            for edge in self.edges:
+                str_graph += ("\n" + self.marking_to_string(edge[0]) + "---" + edge[2].name
+                              + "--->" + self.marking_to_string(edge[1]))
+            print(str_graph)
@@ -0,0 +1,178 @@
+'''
+Symmetry reduction for nets built from replicated components.
+A group is a list of blocks of places, one block per copy of a component, with
+places listed in corresponding order. Any permutation of the blocks of a group
+is an automorphism of the net, so a marking can be replaced by a canonical
+representative of its orbit: the blocks are reordered so that their token
+vectors are sorted. Explorers that only keep canonical markings visit one
+marking per orbit while deadlocks and reachability (of canonical markings)
+are preserved.
+'''
+
+'''
+Groups are either declared by the user, by place names, or detected:
+    1. places and transitions are colored by iterated refinement over the arcs
+    2. places whose color is unique are treated as shared by all copies
+    3. the remaining places split into connected components, components with
+       the same sorted colors are candidate copies of each other
+    4. every candidate group is checked to be an automorphism before use
+'''
+
+#===============================================================================
+
+def _signatures(net, placeindex, perm):
+    """Multiset of transition pre/postsets with places renamed by perm"""
+    sigs = {}
+    for t in net.transitions:
+        pre = tuple(sorted(perm[placeindex[arc.frm]] for arc in t.incoming_arcs))
+        post = tuple(sorted(perm[placeindex[arc.to]] for arc in t.outgoing_arcs))
+        sigs[(pre, post)] = sigs.get((pre, post), 0) + 1
+    return sigs
+
+
+class Symmetry:
+    """Replicated-component symmetries of a Petri net.
+        >>> sym = Symmetry(net)
+        >>> sym = Symmetry(net, [[["idle1", "busy1"], ["idle2", "busy2"]]])
+    """
+
+    def __init__(self, net, groups = None):
+        """Detect or check the symmetry groups of the net
+            @param net: the Petri net
+            @param groups: list of groups, each a list of blocks of place names;
+                           detected from the net structure if None
+        """
+        self.net = net
+        self.placeindex = net.get_place_index_mapping()
+        self.places = list(self.placeindex)
+        self.identity = _signatures(net, self.placeindex, list(range(0, len(self.places))))
+        self.groups = []
+        if groups == None:
+            for group in self.detect_groups():
+                if self.is_automorphism_group(group):
+                    self.groups.append(group)
+        else:
+            for group in groups:
+                blocks = []
+                for block in group:
+                    idx = []
+                    for name in block:
+                        place = net.get_place_by_name(name)
+                        if place == None:
+                            raise Exception("Place "+ name +" not found")
+                        idx.append(self.placeindex[place])
+                    blocks.append(idx)
+                if not self.is_automorphism_group(blocks):
+                    raise Exception("Blocks " + str(group) + " are not interchangeable")
+                self.groups.append(blocks)
+
+    def refine_colors(self):
+        """Color places so that equal colors have the same arc neighborhood
+            @return: a list of place colors, in place index order
+        """
+        nodes = self.places + self.net.transitions
+        color = {}
+        for p in self.places:
+            color[p] = ("p", p.bound)
+        for t in self.net.transitions:
+            color[t] = ("t",)
+        neighbors = {n: [] for n in nodes}
+        for t in self.net.transitions:
+            for arc in t.incoming_arcs:
+                neighbors[t].append(("in", arc.frm))
+                neighbors[arc.frm].append(("out", t))
+            for arc in t.outgoing_arcs:
+                neighbors[t].append(("out", arc.to))
+                neighbors[arc.to].append(("in", t))
+        classes = -1
+        while True:
+            sig = {n: (color[n], tuple(sorted((d, color[m]) for d, m in neighbors[n])))
+                   for n in nodes}
+            names = {}
+            for s in sorted(set(sig.values()), key = repr):
+                names[s] = len(names)
+            color = {n: names[sig[n]] for n in nodes}
+            if len(names) == classes:
+                break
+            classes = len(names)
+        return [color[p] for p in self.places]
+
+    def detect_groups(self):
+        """Find candidate groups of replicated components
+            @return: a list of groups, each a list of blocks of place indices
+        """
+        colors = self.refine_colors()
+        count = {}
+        for c in colors:
+            count[c] = count.get(c, 0) + 1
+        replicated = set(i for i in range(0, len(colors)) if count[colors[i]] > 1)
+        adjacent = {i: set() for i in replicated}
+        for t in self.net.transitions:
+            touched = [self.placeindex[arc.frm] for arc in t.incoming_arcs]
+            touched += [self.placeindex[arc.to] for arc in t.outgoing_arcs]
+            touched = [i for i in touched if i in replicated]
+            for i in touched:
+                adjacent[i].update(touched)
+        shapes = {}
+        seen = set()
+        for i in sorted(replicated):
+            if i in seen:
+                continue
+            component = []
+            stack = [i]
+            seen.add(i)
+            while stack:
+                x = stack.pop()
+                component.append(x)
+                for y in adjacent[x]:
+                    if y not in seen:
+                        seen.add(y)
+                        stack.append(y)
+            block = sorted(component, key = lambda x: colors[x])
+            shape = tuple(colors[x] for x in block)
+            # places of a block need distinct colors to pair them up across copies
+            if len(set(shape)) == len(shape):
+                shapes.setdefault(shape, []).append(block)
+        return [blocks for blocks in shapes.values() if len(blocks) > 1]
+
+    def is_automorphism_group(self, blocks):
+        """Check that every permutation of the blocks is an automorphism
+            A transposition and a cycle of the blocks generate all permutations
+        """
+        if len(blocks) < 2 or len(set(len(b) for b in blocks)) != 1:
+            return False
+        for b in blocks:
+            for i in b:
+                if self.places[i].bound != self.places[blocks[0][0]].bound:
+                    return False
+        n = len(blocks)
+        for order in ([1, 0] + list(range(2, n)), list(range(1, n)) + [0]):
+            perm = list(range(0, len(self.places)))
+            for k in range(0, n):
+                for a, b in zip(blocks[k], blocks[order[k]]):
+                    perm[a] = b
+            if _signatures(self.net, self.placeindex, perm) != self.identity:
+                return False
+        return True
+
+    def canonical(self, marking):
+        """Return the representative of the orbit of a marking
+            The blocks of every group are sorted by their token vectors
+        """
+        if not self.groups:
+            return marking
+        res = list(marking)
+        for blocks in self.groups:
+            keys = sorted(tuple(marking[i] for i in b) for b in blocks)
+            for b, key in zip(blocks, keys):
+                for i, x in zip(b, key):
+                    res[i] = x
+        return res
+
+    def describe(self):
+        """Print the symmetry groups by place names"""
+        for blocks in self.groups:
+            print("Interchangeable blocks: ", end="")
+            for b in blocks:
+                print("{" + ", ".join(self.places[i].name for i in b) + "} ", end="")
+            print()
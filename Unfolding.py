@@ -0,0 +1,383 @@
+'''
+Unfoldings of safe Petri nets.
+The unfolding is built as a complete finite prefix following Esparza, Roemer and
+Vogler (ERV): possible extensions are taken in the total adequate order
+(size, Parikh vector, Foata normal form) of their local configurations, and an
+event whose local configuration reaches an already seen marking is a cut-off.
+Deadlock and marking reachability are decided on the prefix by searching its
+cut-off free configurations, without building the interleaving state space.
+'''
+
+'''
+Notation used in the source code:
+    condition  an occurrence of a place, with the event that produced it
+    event      an occurrence of a transition, with the conditions it consumes
+    co         the concurrency relation between conditions
+    [e]        the local configuration of event e, stored as a bitmask of event ids
+Only safe nets are supported, an exception is raised when a place of the net
+would receive a second token, either in the marking of a local configuration or
+through two concurrent conditions of the same place (a contact). Transitions with a place in both their preset and
+postset are rejected too: Transition.can_fire refuses to fire them when that
+place is at its bound, which standard unfolding semantics cannot express.
+'''
+
+import heapq
+#===============================================================================
+
+def _bits(mask):
+    """Iterate over the ids set in a bitmask"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _lex_less(a, b):
+    """Lexicographic order on sparse count vectors {transition index: count}"""
+    for t in sorted(set(a) | set(b)):
+        if a.get(t, 0) != b.get(t, 0):
+            return a.get(t, 0) < b.get(t, 0)
+    return False
+
+
+class _ConfigOrder:
+    """ERV order of a local configuration, beyond its size.
+        The Parikh vector and the Foata normal form are only computed when two
+        possible extensions of the same size are compared, and then cached.
+    """
+
+    def __init__(self, unf, t, config):
+        """@param config: bitmask of the events below the new event of transition t"""
+        self.unf = unf
+        self.t = t
+        self.config = config
+        self.parikh = None
+        self.levels = None
+
+    def compute(self):
+        """Sparse Parikh vector and Foata levels of the configuration"""
+        unf = self.unf
+        self.parikh = {self.t: 1}
+        levels = {}
+        depth = 0
+        for e in _bits(self.config):
+            t = unf.ev_trans[e]
+            self.parikh[t] = self.parikh.get(t, 0) + 1
+            level = levels.setdefault(unf.ev_depth[e], {})
+            level[t] = level.get(t, 0) + 1
+            depth = max(depth, unf.ev_depth[e])
+        levels[depth + 1] = {self.t: 1}
+        self.levels = [levels.get(d, {}) for d in range(1, depth + 2)]
+
+    def __lt__(self, other):
+        if self.parikh == None:
+            self.compute()
+        if other.parikh == None:
+            other.compute()
+        if self.parikh != other.parikh:
+            return _lex_less(self.parikh, other.parikh)
+        for a, b in zip(self.levels, other.levels):
+            if a != b:
+                return _lex_less(a, b)
+        return len(self.levels) < len(other.levels)
+
+    def __eq__(self, other):
+        return not self < other and not other < self
+
+
+class Unfolding:
+    """A complete finite prefix of the unfolding of a safe Petri net.
+        >>> unf = Unfolding(net)
+        >>> unf.find_deadlock()
+    """
+
+    def __init__(self, net):
+        """Build the complete finite prefix of the net
+            @param net: a safe Petri net
+        """
+        self.net = net
+        self.placeindex = net.get_place_index_mapping()
+        self.places = list(self.placeindex)
+        self.transitions = net.transitions
+        self.preset = []
+        self.postset = []
+        self.consumers = [[] for p in self.places]
+        for i in range(0, len(self.transitions)):
+            t = self.transitions[i]
+            pre = [self.placeindex[arc.frm] for arc in t.incoming_arcs]
+            post = [self.placeindex[arc.to] for arc in t.outgoing_arcs]
+            if not pre:
+                raise Exception("Transition " + t.name + " has an empty preset, the net is not safe")
+            if set(pre) & set(post):
+                raise Exception("Transition " + t.name + " has a self-loop place, it cannot be unfolded")
+            self.preset.append(pre)
+            self.postset.append(post)
+            # a transition needing two tokens from one place never fires in a safe net
+            if len(set(pre)) == len(pre):
+                for p in pre:
+                    self.consumers[p].append(i)
+        # conditions
+        self.cond_place = []
+        self.cond_pre = []
+        self.cond_post = []
+        self.co = []
+        # events
+        self.ev_trans = []
+        self.ev_pre = []
+        self.ev_post = []
+        self.ev_config = []
+        self.ev_depth = []
+        self.ev_cutoff = []
+        self.producers = [[] for p in self.places]
+        self.marks = {}
+        self.build()
+
+    def build(self):
+        """Compute the prefix, taking possible extensions in adequate order"""
+        init = list(self.net.init_marking)
+        for x in init:
+            if x > 1:
+                raise Exception("The initial marking is not safe")
+        self.marks[tuple(init)] = -1
+        initial = [self.add_condition(p, -1) for p in range(0, len(init)) if init[p]]
+        for c in initial:
+            self.co[c] = set(initial) - {c}
+        self.initial = initial
+        queue = []
+        seen = set()
+        self.extend(initial, queue, seen)
+        while queue:
+            key, _, t, pre = heapq.heappop(queue)
+            e = self.add_event(t, pre)
+            if not self.ev_cutoff[e]:
+                self.extend(self.ev_post[e], queue, seen)
+
+    def add_condition(self, place, event):
+        """Add a condition for a place, produced by an event (-1 for the initial marking)"""
+        self.cond_place.append(place)
+        self.cond_pre.append(event)
+        self.cond_post.append([])
+        self.co.append(set())
+        return len(self.cond_place) - 1
+
+    def add_event(self, t, pre):
+        """Add an event with its postset and decide if it is a cut-off"""
+        e = len(self.ev_trans)
+        config = 1 << e
+        depth = 0
+        for c in pre:
+            if self.cond_pre[c] != -1:
+                config |= self.ev_config[self.cond_pre[c]]
+                depth = max(depth, self.ev_depth[self.cond_pre[c]])
+        self.ev_trans.append(t)
+        self.ev_pre.append(pre)
+        for c in pre:
+            self.cond_post[c].append(e)
+        self.ev_config.append(config)
+        self.ev_depth.append(depth + 1)
+        mark = tuple(self.config_marking(config))
+        cutoff = mark in self.marks
+        if not cutoff:
+            self.marks[mark] = e
+        self.ev_cutoff.append(cutoff)
+        common = set.intersection(*[self.co[c] for c in pre])
+        marked = set(self.cond_place[d] for d in common)
+        if len(set(self.postset[t])) != len(self.postset[t]) or marked & set(self.postset[t]):
+            raise Exception("The net is not safe")
+        post = [self.add_condition(p, e) for p in self.postset[t]]
+        self.ev_post.append(post)
+        for p in self.postset[t]:
+            self.producers[p].append(e)
+        if not cutoff:
+            # conditions of cut-off events are never extended, so they stay out of co
+            for c in post:
+                self.co[c] = common | (set(post) - {c})
+            for d in common:
+                self.co[d].update(post)
+        return e
+
+    def config_marking(self, config):
+        """Marking reached by a configuration, as a list"""
+        m = list(self.net.init_marking)
+        for e in _bits(config):
+            t = self.ev_trans[e]
+            for p in self.preset[t]:
+                m[p] -= 1
+            for p in self.postset[t]:
+                m[p] += 1
+        for x in m:
+            if x > 1:
+                raise Exception("The net is not safe")
+        return m
+
+    def order_key(self, t, pre):
+        """ERV adequate order key of the local configuration of a possible extension
+            The size is compared first, the rest of the order is computed lazily
+        """
+        config = 0
+        for c in pre:
+            if self.cond_pre[c] != -1:
+                config |= self.ev_config[self.cond_pre[c]]
+        return (bin(config).count("1") + 1, _ConfigOrder(self, t, config))
+
+    def extend(self, new, queue, seen):
+        """Push the possible extensions that use at least one new condition
+            @param new: the new conditions
+            @param queue: the priority queue of possible extensions
+            @param seen: the extensions already pushed, as (transition, conditions)
+        """
+        for c in new:
+            for t in self.consumers[self.cond_place[c]]:
+                others = [p for p in self.preset[t] if p != self.cond_place[c]]
+                for pre in self.co_sets(others, [c]):
+                    ext = (t, frozenset(pre))
+                    if ext in seen:
+                        continue
+                    seen.add(ext)
+                    heapq.heappush(queue, (self.order_key(t, pre), len(seen), t, tuple(pre)))
+
+    def co_sets(self, places, chosen):
+        """Enumerate sets of pairwise concurrent conditions for the given places
+            @param places: the places still to cover
+            @param chosen: the conditions picked so far
+        """
+        if not places:
+            yield list(chosen)
+            return
+        candidates = self.co[chosen[0]]
+        for c in chosen[1:]:
+            candidates = candidates & self.co[c]
+        for d in candidates:
+            if self.cond_place[d] == places[0]:
+                chosen.append(d)
+                yield from self.co_sets(places[1:], chosen)
+                chosen.pop()
+
+    #===========================================================================
+
+    def cut(self, config):
+        """Conditions marked after a configuration"""
+        cut = set(self.initial)
+        for e in _bits(config):
+            cut.update(self.ev_post[e])
+        for e in _bits(config):
+            cut.difference_update(self.ev_pre[e])
+        return cut
+
+    def add_config(self, config, f):
+        """Add the local configuration of f to a configuration
+            @return: the union, or None if it is not conflict-free
+        """
+        union = config | self.ev_config[f]
+        consumed = set()
+        for e in _bits(union):
+            for c in self.ev_pre[e]:
+                if c in consumed:
+                    return None
+                consumed.add(c)
+        return union
+
+    def search(self, goal, branch):
+        """Depth-first search over cut-off free configurations
+            @param goal: called with a configuration and its cut, True for a solution
+            @param branch: called with a configuration, its cut and the excluded events,
+                           returns the (configuration, excluded) pairs to explore
+            @return: the cut of a solution, None if there is none
+        """
+        stack = [(0, 0)]
+        visited = set()
+        while stack:
+            state = stack.pop()
+            if state in visited:
+                continue
+            visited.add(state)
+            config, excluded = state
+            cut = self.cut(config)
+            if goal(config, cut):
+                return cut
+            stack.extend(branch(config, cut, excluded))
+        return None
+
+    def consuming(self, config, excluded, conds, skip = -1):
+        """Configurations extending config by an event consuming one of conds"""
+        res = []
+        for b in conds:
+            for f in self.cond_post[b]:
+                if f == skip or self.ev_cutoff[f]:
+                    continue
+                union = self.add_config(config, f)
+                if union != None and not union & excluded:
+                    res.append((union, excluded))
+        return res
+
+    def enabled_events(self, config, cut):
+        """Events of the prefix enabled after a configuration"""
+        res = set()
+        for c in cut:
+            for e in self.cond_post[c]:
+                if all(d in cut for d in self.ev_pre[e]):
+                    res.add(e)
+        return sorted(res)
+
+    def find_deadlock(self):
+        """Return a reachable marking enabling no transition, None if deadlock-free"""
+        def goal(config, cut):
+            return not self.enabled_events(config, cut)
+
+        def branch(config, cut, excluded):
+            e = self.enabled_events(config, cut)[0]
+            res = []
+            # either e belongs to the deadlocking configuration ...
+            if not self.ev_cutoff[e] and not (excluded >> e) & 1:
+                res.append((config | (1 << e), excluded))
+            # ... or a conflicting event takes one of its input conditions
+            for union, x in self.consuming(config, excluded | (1 << e), self.ev_pre[e], e):
+                res.append((union, x))
+            return res
+
+        cut = self.search(goal, branch)
+        return None if cut == None else self.cut_marking(cut)
+
+    def is_reachable(self, marking):
+        """Check if a marking is reachable
+            @param marking: a marking list, or a string such as [1.p1,1.p2]
+        """
+        if isinstance(marking, str):
+            marking = self.net.marking_from_string(marking)
+        marking = list(marking)
+        if max(marking, default = 0) > 1:
+            return False
+        target = set(p for p in range(0, len(marking)) if marking[p])
+
+        def goal(config, cut):
+            return self.cut_marking(cut) == marking
+
+        def branch(config, cut, excluded):
+            for b in cut:
+                if self.cond_place[b] not in target:
+                    return self.consuming(config, excluded, [b])
+            # every marked place is wanted, so an event must produce a missing one
+            p = min(target - set(self.cond_place[c] for c in cut))
+            res = []
+            for f in self.producers[p]:
+                if self.ev_cutoff[f] or (config >> f) & 1:
+                    continue
+                union = self.add_config(config, f)
+                if union != None and not union & excluded:
+                    res.append((union, excluded))
+            return res
+
+        return self.search(goal, branch) != None
+
+    def cut_marking(self, cut):
+        """Marking of a cut, as a list"""
+        m = [0]*len(self.places)
+        for c in cut:
+            m[self.cond_place[c]] += 1
+        return m
+
+    def describe(self):
+        """Print the size of the prefix"""
+        print("Conditions: " + str(len(self.cond_place)))
+        print("Events: " + str(len(self.ev_trans)))
+        print("Cut-off events: " + str(sum(1 for x in self.ev_cutoff if x)))
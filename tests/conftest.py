@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def make_net():
+    """Factory building a net from lists of input and output place indices per transition
+        Places are named p0, p1, ... and transitions t0, t1, ...
+    """
+    from Petrinet import Petrinet
+
+    def build(pre, post, init, bound = 1):
+        net = Petrinet(bound)
+        places = [net.place("p" + str(i)) for i in range(0, len(init))]
+        for j in range(0, len(pre)):
+            t = net.transition("t" + str(j))
+            for i in pre[j]:
+                net.arc(places[i], t, "input")
+            for i in post[j]:
+                net.arc(t, places[i], "output")
+        net.setInit_marking(list(init))
+        return net
+
+    return build
+
+
+@pytest.fixture
+def explore():
+    """Reachable markings and deadlocks of a net, from Petrinet.reachability_graph_edges"""
+    def run(net, symmetry = None):
+        states, edges = net.reachability_graph_edges(symmetry)
+        sources = set(tuple(u) for u, v, t in edges)
+        return states, [u for u in states if tuple(u) not in sources]
+
+    return run
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Petrinet import Petrinet
+from Persistence import write_pnml
+from Batch import load_net, main
+
+
+def component(names):
+    """A net p -> t -> q -> sync -> p, for the given place and transition names"""
+    net = Petrinet()
+    p, q = net.place(names[0]), net.place(names[1])
+    t, sync = net.transition(names[2]), net.transition("sync")
+    net.arc(p, t, "input")
+    net.arc(t, q, "output")
+    net.arc(q, sync, "input")
+    net.arc(sync, p, "output")
+    net.setInit_marking([1, 0])
+    return net
+
+
+def test_single_file_keeps_transitions_with_the_same_name(tmp_path):
+    net = Petrinet()
+    p, q = net.place("p"), net.place("q")
+    for a, b in ((p, q), (q, p)):
+        t = net.transition("tau")
+        net.arc(a, t, "input")
+        net.arc(t, b, "output")
+    net.setInit_marking([1, 0])
+    write_pnml(net, str(tmp_path / "tau.pnml"))
+    assert [t.name for t in load_net(str(tmp_path / "tau.pnml"), 1).transitions] == ["tau", "tau"]
+
+
+def test_main_runs_a_merged_sweep(tmp_path):
+    write_pnml(component(["a1", "a2", "ta"]), str(tmp_path / "a.pnml"))
+    write_pnml(component(["b1", "b2", "tb"]), str(tmp_path / "b.pnml"))
+    spec = str(tmp_path / "a.pnml") + "," + str(tmp_path / "b.pnml")
+    output = str(tmp_path / "out.jsonl")
+    code = main([spec, "--job", "reachability", "--job", "coverability",
+                 "--processes", "1", "--timeout", "30", "--output", output])
+    assert code == 0
+    results = [json.loads(line) for line in open(output)]
+    assert [r["job"] for r in results] == ["reachability", "coverability"]
+    assert all(r["status"] == "ok" for r in results)
+    # ta and tb interleave, sync needs both of their outputs
+    assert results[0]["result"]["states"] == 4
+    assert results[0]["result"]["edges"] == 5
+    assert results[0]["result"]["deadlocks"] == []
+    assert results[1]["result"]["bounded"]
+    assert set(results[1]["result"]["place_bounds"].values()) == {1}
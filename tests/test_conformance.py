@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Conformance import compile_net, replay_trace, read_csv_traces, read_xes_traces, TokenReplay
+
+# p0 -> t0 -> p1 -> t1 -> p2
+SEQUENCE = ([[0], [1]], [[1], [2]], [1, 0, 0])
+
+XES = """<?xml version="1.0" encoding="UTF-8"?>
+<log xmlns="http://www.xes-standard.org/">
+  <string key="concept:name" value="log"/>
+  <trace>
+    <string key="concept:name" value="c1"/>
+    <event><string key="concept:name" value="t0"/></event>
+    <event><string key="concept:name" value="t1"/></event>
+  </trace>
+  <trace>
+    <string key="concept:name" value="c2"/>
+    <event><string key="concept:name" value="t1"/></event>
+  </trace>
+</log>
+"""
+
+
+def test_default_final_marking_is_one_token_per_sink(make_net):
+    init, transitions, final = compile_net(make_net(*SEQUENCE))
+    assert final == (0, 0, 1)
+    assert transitions == {"t0": ([0], [1]), "t1": ([1], [2])}
+
+
+def test_replay_counts(make_net):
+    compiled = compile_net(make_net(*SEQUENCE))
+    assert replay_trace(compiled, ["t0", "t1"]) == (0, 0, 3, 3, 0)
+    # t1 misses the token of p1, the token of p0 remains
+    assert replay_trace(compiled, ["t1"]) == (1, 1, 2, 2, 0)
+    assert replay_trace(compiled, ["t0", "x", "t1"]) == (0, 0, 3, 3, 1)
+    assert replay_trace(compiled, [], [1, 0, 0]) == (0, 0, 1, 1, 0)
+
+
+def test_unknown_events_do_not_fit(make_net):
+    result = TokenReplay(make_net(*SEQUENCE), processes = 1).replay([["t0", "t1"], ["t0", "x", "t1"]])
+    assert result.traces == 2
+    assert result.fitting_traces == 1
+    assert result.unknown_events == 1
+    assert "unknown events = 1" in str(result)
+
+
+def test_csv_reader(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("case:concept:name,concept:name\nc1,t0\nc1,t1\nc2,t1\n")
+    assert list(read_csv_traces(str(path))) == [("c1", ["t0", "t1"]), ("c2", ["t1"])]
+
+
+def test_csv_reader_rejects_interleaved_cases(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("case:concept:name,concept:name\nc1,t0\nc2,t1\nc1,t1\n")
+    with pytest.raises(Exception):
+        list(read_csv_traces(str(path)))
+
+
+def test_xes_reader(tmp_path):
+    path = tmp_path / "log.xes"
+    path.write_text(XES)
+    assert list(read_xes_traces(str(path))) == [("c1", ["t0", "t1"]), ("c2", ["t1"])]
+
+
+def test_pool_matches_local_replay(make_net, tmp_path):
+    path = tmp_path / "log.xes"
+    path.write_text(XES)
+    net = make_net(*SEQUENCE)
+    local = TokenReplay(net, batch_size = 1, processes = 1).replay_file(str(path))
+    pooled = TokenReplay(net, batch_size = 1, processes = 2).replay_file(str(path))
+    assert vars(pooled) == vars(local)
+    assert (local.traces, local.fitting_traces, local.missing, local.remaining) == (2, 1, 1, 1)
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Petrinet import CoverGraph, OMEGA
+
+
+def maximal(markings):
+    """Maximal markings by pairwise comparison"""
+    res = []
+    for m in markings:
+        if not any(n != m and all(a >= b for a, b in zip(n, m)) for n in markings):
+            res.append(m)
+    return sorted(res)
+
+
+def test_minimal_set_keeps_initial_branch(make_net):
+    net = make_net([[0], [1], [4], [4]], [[4], [4], [2, 4], [0, 3]], [1, 0, 1, 1, 0])
+    cg = CoverGraph(net)
+    mcs = cg.build_minimal_set()
+    assert [1, 0, OMEGA, OMEGA, 0] in mcs
+    assert cg.place_bound("p0") == 1
+    assert cg.place_bound("p2") == OMEGA
+    assert not cg.is_bounded()
+
+
+def test_minimal_set_matches_karp_miller_graph(make_net):
+    rng = random.Random(0)
+    for _ in range(500):
+        n = rng.randint(2, 5)
+        pre = [rng.sample(range(n), rng.randint(1, 2)) for _ in range(rng.randint(1, 5))]
+        post = [rng.sample(range(n), rng.randint(0, 2)) for _ in pre]
+        init = [rng.randint(0, 1) for _ in range(n)]
+        net = make_net(pre, post, init)
+        expected = maximal(CoverGraph(net).build_graph())
+        cg = CoverGraph(net)
+        assert sorted(cg.build_minimal_set()) == expected
+        for i in range(0, n):
+            assert cg.place_bound("p" + str(i)) == max(m[i] for m in expected)
@@ -0,0 +1,93 @@
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Petrinet import Petrinet, TranSys
+from Persistence import write_pnml, read_pnml, save_snapshot, load_snapshot
+
+
+def structure(net):
+    """Arcs of every transition by place index, for comparing nets"""
+    placeindex = net.get_place_index_mapping()
+    return [(t.name, sorted(placeindex[arc.frm] for arc in t.incoming_arcs),
+             sorted(placeindex[arc.to] for arc in t.outgoing_arcs)) for t in net.transitions]
+
+
+def test_pnml_round_trip(make_net, tmp_path):
+    net = make_net([[0], [1, 2]], [[1, 2], [0]], [1, 0, 0])
+    write_pnml(net, str(tmp_path / "net.pnml"))
+    back = read_pnml(str(tmp_path / "net.pnml"))
+    assert [p.name for p in back.places] == [p.name for p in net.places]
+    assert structure(back) == structure(net)
+    assert back.init_marking == [1, 0, 0]
+
+
+def test_pnml_parallel_arcs_become_inscriptions(tmp_path):
+    net = Petrinet(2)
+    p, q = net.place("p"), net.place("q")
+    t = net.transition("t")
+    net.arc(p, t, "input")
+    net.arc(p, t, "input")
+    net.arc(t, q, "output")
+    net.setInit_marking([2, 0])
+    write_pnml(net, str(tmp_path / "net.pnml"))
+    text = (tmp_path / "net.pnml").read_text()
+    assert text.count("<arc ") == 2
+    assert "inscription" in text
+    back = read_pnml(str(tmp_path / "net.pnml"), 2)
+    assert structure(back) == structure(net)
+    assert back.init_marking == [2, 0]
+
+
+def test_pnml_duplicate_place_names_keep_marking(tmp_path):
+    net = Petrinet()
+    net.place("p")
+    net.place("p")
+    net.setInit_marking([0, 1])
+    write_pnml(net, str(tmp_path / "net.pnml"))
+    back = read_pnml(str(tmp_path / "net.pnml"))
+    assert back.init_marking == [0, 1]
+    assert [p.tokens for p in back.places] == [0, 1]
+
+
+def test_snapshot_round_trip(make_net, tmp_path):
+    net = make_net([[0], [1]], [[1], [0]], [1, 0])
+    path = str(tmp_path / "net.pns")
+    save_snapshot(path, net)
+    seen, graph_edges = net.reachability_graph_edges()
+    with load_snapshot(path) as snap:
+        assert snap.place_names == ["p0", "p1"]
+        assert [snap.state(i) for i in range(0, snap.num_states)] == seen
+        assert snap.relation() == [[u, t.name, v] for u, v, t in graph_edges]
+        back = snap.to_net()
+    assert structure(back) == structure(net)
+    assert back.init_marking == [1, 0]
+
+
+def test_snapshot_empty_arrays(tmp_path):
+    # no transitions and no arcs: the arc and edge arrays are empty
+    net = Petrinet()
+    net.place("p")
+    net.setInit_marking([1])
+    path = str(tmp_path / "net.pns")
+    save_snapshot(path, net)
+    snap = load_snapshot(path)
+    assert snap.transition_names == []
+    assert snap.relation() == []
+    assert [snap.state(i) for i in range(0, snap.num_states)] == [[1]]
+    assert snap.to_net().init_marking == [1]
+    snap.close()
+
+
+def test_snapshot_keeps_states_without_transitions(make_net, tmp_path):
+    net = make_net([[0]], [[1]], [1, 0])
+    ts = TranSys(net)
+    path = str(tmp_path / "ts.pns")
+    save_snapshot(path, net, ts.transitions_relation, ts.statespace)
+    with load_snapshot(path) as snap:
+        states = [snap.state(i) for i in range(0, snap.num_states)]
+        relation = snap.relation()
+    assert sorted(states) == sorted(ts.statespace)
+    assert relation == [[u, t.name, v] for u, t, v in ts.transitions_relation]
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Petrinet import Petrinet
+from Symmetry import Symmetry
+
+
+def workers(n, release = True):
+    """n copies of idle -> acquire -> busy -> release -> idle sharing a mutex place"""
+    net = Petrinet()
+    mutex = net.place("mutex")
+    init = [1]
+    for i in range(1, n + 1):
+        idle, busy = net.place("idle" + str(i)), net.place("busy" + str(i))
+        acquire = net.transition("acquire" + str(i))
+        net.arc(idle, acquire, "input")
+        net.arc(mutex, acquire, "input")
+        net.arc(acquire, busy, "output")
+        if release:
+            t = net.transition("release" + str(i))
+            net.arc(busy, t, "input")
+            net.arc(t, idle, "output")
+            net.arc(t, mutex, "output")
+        init += [1, 0]
+    net.setInit_marking(init)
+    return net
+
+
+def test_detects_replicated_workers():
+    net = workers(3)
+    sym = Symmetry(net)
+    assert len(sym.groups) == 1
+    names = sorted(sorted(sym.places[i].name for i in b) for b in sym.groups[0])
+    assert names == [["busy1", "idle1"], ["busy2", "idle2"], ["busy3", "idle3"]]
+
+
+def test_declared_group_must_be_an_automorphism():
+    net = workers(2)
+    Symmetry(net, [[["idle1", "busy1"], ["idle2", "busy2"]]])
+    with pytest.raises(Exception):
+        Symmetry(net, [[["idle1", "busy1"], ["busy2", "idle2"]]])
+    with pytest.raises(Exception):
+        Symmetry(net, [[["idle1", "busy1"], ["idle2", "mutex"]]])
+
+
+@pytest.mark.parametrize("release", [True, False])
+def test_reduction_preserves_deadlocks_and_reachability(explore, release):
+    net = workers(3, release)
+    sym = Symmetry(net)
+    full, full_dead = explore(net)
+    reduced, reduced_dead = explore(net, sym)
+    assert len(reduced) < len(full)
+    assert set(tuple(sym.canonical(u)) for u in full) == set(tuple(u) for u in reduced)
+    assert bool(full_dead) == bool(reduced_dead) == (not release)
+    assert set(tuple(sym.canonical(u)) for u in full_dead) == set(tuple(u) for u in reduced_dead)
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Petrinet import TranSys
+
+
+def reference_sequence(ts, marking):
+    """The list-based BFS of the original build_transys_sequence_from_marking"""
+    queue = [marking]
+    seen = []
+    while queue:
+        u = queue.pop(0)
+        if u in seen:
+            continue
+        seen.append(u)
+        for t in ts.transitions:
+            if t.can_fire(u, ts.placeindex):
+                v = t.fire(u, ts.placeindex)
+                if v not in seen:
+                    queue.append(v)
+    return seen
+
+
+def reference_relation(ts):
+    """The original build_transition_relation: one BFS per unseen state"""
+    seen = []
+    relation = []
+    for s in ts.statespace:
+        if s in seen:
+            continue
+        queue = [s]
+        while queue:
+            u = queue.pop(0)
+            if u in seen:
+                continue
+            seen.append(u)
+            for t in ts.transitions:
+                if t.can_fire(u, ts.placeindex):
+                    v = t.fire(u, ts.placeindex)
+                    relation.append([u, t, v])
+                    if v not in seen:
+                        queue.append(v)
+    for u, t, v in relation:
+        if u in seen:
+            seen.remove(u)
+        if v in seen:
+            seen.remove(v)
+    return relation, seen
+
+
+def test_explorer_matches_list_based_bfs(make_net):
+    rng = random.Random(0)
+    for _ in range(0, 100):
+        n = rng.randint(1, 4)
+        pre = [rng.sample(range(n), rng.randint(0, min(2, n))) for _ in range(rng.randint(1, 4))]
+        post = [rng.sample(range(n), rng.randint(0, min(2, n))) for _ in pre]
+        init = [rng.randint(0, 1) for _ in range(n)]
+        ts = TranSys(make_net(pre, post, init, bound = rng.randint(1, 2)))
+        relation, silent = reference_relation(ts)
+        assert ts.transitions_relation == relation
+        assert ts.silent_marking == silent
+        for s in ts.statespace:
+            assert ts.build_transys_sequence_from_marking(s) == reference_sequence(ts, s)
+
+
+def test_ts_graph_build_from_marking_prints_each_state_once(make_net, capsys):
+    # p0 -> t0 -> p1 -> t1 -> p2
+    ts = TranSys(make_net([[0], [1]], [[1], [2]], [1, 0, 0]))
+    capsys.readouterr()
+    ts.ts_graph_build([0, 1, 0])
+    edges = [line for line in capsys.readouterr().out.split("\n") if "-->" in line]
+    # states reachable from the given marking are left out, later components only
+    # list the states that no earlier component reached
+    assert edges == ["[0, 0, 0]--None-->",
+                     "[1, 0, 0]--t0-->[0, 1, 0]",
+                     "[1, 1, 0]--t1-->[1, 0, 1]",
+                     "[1, 0, 1]--t0-->[0, 1, 1]",
+                     "[1, 1, 1]--None-->"]
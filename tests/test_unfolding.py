@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+pytest.importorskip("graphviz")
+pytest.importorskip("IPython")
+pytest.importorskip("PIL")
+
+from Unfolding import Unfolding
+
+
+def test_self_loop_is_rejected(make_net):
+    net = make_net([[0]], [[0]], [1], bound = 1)
+    with pytest.raises(Exception):
+        Unfolding(net)
+
+
+def test_concurrent_contact_is_rejected(make_net):
+    # t0 and t1 are concurrent and both put a token into p
+    net = make_net([[0], [1]], [[2], [2]], [1, 1, 0], bound = 1)
+    with pytest.raises(Exception):
+        Unfolding(net)
+
+
+def test_queries_match_state_space(make_net, explore):
+    rng = random.Random(0)
+    tested = 0
+    while tested < 300:
+        n = rng.randint(2, 7)
+        pre = [rng.sample(range(n), rng.randint(1, 2)) for _ in range(rng.randint(1, 7))]
+        post = [[i for i in rng.sample(range(n), rng.randint(0, 2)) if i not in p] for p in pre]
+        init = [0]*n
+        for i in rng.sample(range(n), rng.randint(1, min(3, n))):
+            init[i] = 1
+        # a larger bound shows whether the net is safe without blocked transitions
+        safe = max(max(m) for m in explore(make_net(pre, post, init, bound = 3))[0]) <= 1
+        net = make_net(pre, post, init, bound = 1)
+        states, deadlocks = explore(net)
+        if not safe:
+            with pytest.raises(Exception):
+                Unfolding(net)
+            continue
+        tested += 1
+        unf = Unfolding(net)
+        witness = unf.find_deadlock()
+        assert (witness != None) == bool(deadlocks)
+        if witness != None:
+            assert witness in deadlocks
+        for m in states:
+            assert unf.is_reachable(m)
+        for _ in range(20):
+            m = [rng.randint(0, 1) for _ in range(n)]
+            assert unf.is_reachable(m) == (m in states)